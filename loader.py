@@ -10,7 +10,7 @@ Outputs CSVs suitable for PostgreSQL COPY:
   - out/products.csv
   - out/suppliers.csv
   - out/supplier_items.csv  (optional scaffold, unique by supplier+product)
-  - out/price_quotes.csv
+  - out/price_quotes.csv  (+ out/price_quotes.parquet; optionally COPYed straight to Postgres when outputs.pg_dsn is set)
   - out/reference_columns.csv
   - out/manifest.json (row counts, batch id, timings)
 
@@ -24,33 +24,58 @@ Rules (per spec):
     are excluded from staging but listed in reference_columns.csv.
 
 Usage:
-  Edit config.yaml then:  python loader.py
+  Edit config.yaml then:  python loader.py  (--force to rerun when no input has changed)
 """
 
-import os, sys, re, json, hashlib
-from datetime import datetime
+import os, sys, io, re, json, glob, hashlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+import numpy as np
 import pandas as pd
+from pandas.util import hash_pandas_object
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 import yaml
 
+try:
+    import python_calamine  # noqa: F401  (Rust xlsx parser, much faster than openpyxl)
+    EXCEL_ENGINE = "calamine"
+except ImportError:
+    EXCEL_ENGINE = "openpyxl"
+
+try:
+    import orjson  # C JSON encoder, used for manifest.json when installed
+except ImportError:
+    orjson = None
+
 def log(msg):
     print(f"[{datetime.utcnow().isoformat()}Z] {msg}", flush=True)
 
-def normalize_bucket_with_notes(bucket, notes):
-    t_bucket = str(bucket).strip().lower() if pd.notna(bucket) else ""
-    t_notes  = str(notes).strip().lower() if pd.notna(notes) else ""
-    if any(k in t_notes for k in ["ref only", "reference", "derived", "duplicate", "do not stage", "not part of staging", "exclude"]):
-        return "Reference/Derived"
-    if "master" in t_bucket or "dm" in t_bucket:
-        return "Master/DM+D"
-    if "order" in t_bucket and "qty" in t_bucket:
-        return "Order Qty"
-    if "supplier" in t_bucket or "price" in t_bucket:
-        return "Supplier/Price"
-    if "reference" in t_bucket or "derived" in t_bucket:
-        return "Reference/Derived"
-    if "other" in t_bucket or "meta" in t_bucket:
-        return "Other/Meta"
-    return "Other/Meta"
+REFERENCE_NOTE_KEYWORDS = ["ref only", "reference", "derived", "duplicate", "do not stage", "not part of staging", "exclude"]
+_REF_KEYWORDS_RE = "|".join(map(re.escape, REFERENCE_NOTE_KEYWORDS))
+
+# One bit per Bucket token; each token is matched once over the whole column
+_BUCKET_TOKENS = ["master", "dm", "order", "qty", "supplier", "price", "reference", "derived"]
+_MASTER, _DM, _ORDER, _QTY, _SUPPLIER, _PRICE, _REFERENCE, _DERIVED = (1 << i for i in range(len(_BUCKET_TOKENS)))
+
+def normalize_buckets_with_notes(buckets, notes):
+    # Vectorized over the whole mapping: token flags packed into a uint8 per row, decoded with integer masks
+    b = pd.Series(buckets).fillna("").astype(str).str.lower()
+    n = pd.Series(notes, index=b.index).fillna("").astype(str).str.lower()
+    flags = np.zeros(len(b), dtype=np.uint8)
+    for bit, token in enumerate(_BUCKET_TOKENS):
+        flags |= b.str.contains(token, regex=False).to_numpy(dtype=np.uint8) << bit
+    conditions = [
+        n.str.contains(_REF_KEYWORDS_RE, regex=True).to_numpy(dtype=bool),
+        (flags & (_MASTER | _DM)) != 0,
+        (flags & (_ORDER | _QTY)) == (_ORDER | _QTY),
+        (flags & (_SUPPLIER | _PRICE)) != 0,
+        (flags & (_REFERENCE | _DERIVED)) != 0,
+    ]
+    choices = ["Reference/Derived", "Master/DM+D", "Order Qty", "Supplier/Price", "Reference/Derived"]
+    return np.select(conditions, choices, default="Other/Meta")
 
 MONTH_MAP = {'jan':1,'january':1,'feb':2,'february':2,'mar':3,'march':3,'apr':4,'april':4,'may':5,
              'jun':6,'june':6,'jul':7,'july':7,'aug':8,'august':8,'sep':9,'sept':9,'september':9,
@@ -67,40 +92,284 @@ CHANNEL_PATTERNS = [
     ("Tender",       r"\b(tender|tendered)\b"),
 ]
 
-def parse_valid_from(raw_header):
-    lc = str(raw_header).lower()
-    m = re.search(r'(jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[^\d]{0,3}(\d{2,4})', lc)
-    if not m:
-        return ""
-    mon, y = m.group(1), m.group(2)
+CHANNEL_PATTERNS_COMPILED = [(label, re.compile(pat, re.IGNORECASE)) for label, pat in CHANNEL_PATTERNS]
+
+# Header regexes, compiled once (headers are parsed per supplier column)
+_MONTH_TOKENS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec"]
+_MONTHS = "(" + "|".join(_MONTH_TOKENS) + ")"
+_VALID_FROM_RE = re.compile(_MONTHS + r'[^\d]{0,3}(\d{2,4})')
+_MONTH_STRIP_RE = re.compile(r'[\-\–\—_/]*\s*' + _MONTHS + r'[^\d]{0,3}(\d{2,4})?', re.IGNORECASE)
+_MARKER_RE = re.compile(r'\b(price|concessions|orderlist|last purchased)\b', re.IGNORECASE)
+_WS_RE = re.compile(r'\s{2,}')
+
+def _format_valid_from(mon, y):
     month = MONTH_MAP.get(mon, None)
     if month is None: return ""
     y = int(y)
     year = 2000 + y if y < 100 else y
     return f"{year:04d}-{month:02d}-01"
 
+# (month token, year digits) -> "YYYY-MM-01" for the usual 2-digit and 1990-2049 years
+_MONTH_YEAR_CACHE = {(mon, y): _format_valid_from(mon, y)
+                     for mon in _MONTH_TOKENS
+                     for y in [f"{yy:02d}" for yy in range(100)] + [str(yy) for yy in range(1990, 2050)]}
+
+def parse_valid_from(raw_header):
+    m = _VALID_FROM_RE.search(str(raw_header).lower())
+    if not m:
+        return ""
+    key = m.groups()
+    hit = _MONTH_YEAR_CACHE.get(key)
+    return hit if hit is not None else _format_valid_from(*key)
+
 def parse_supplier_and_channel_from_header(header_text):
     # Fallback parsing when alias table doesn't provide a mapping for this column
     text = str(header_text).strip()
     lc = text.lower()
-    base = re.sub(r'[\-\–\—_/]*\s*(jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[^\d]{0,3}(\d{2,4})?', '', lc, flags=re.IGNORECASE)
-    base = re.sub(r'\s{2,}', ' ', base).strip()
-    for n in ["price", "concessions", "orderlist", "last purchased"]:
-        base = re.sub(rf'\b{n}\b', '', base, flags=re.IGNORECASE).strip()
+    base = _MONTH_STRIP_RE.sub('', lc)
+    base = _WS_RE.sub(' ', base).strip()
+    base = _MARKER_RE.sub('', base).strip()
     detected_channel = ""
-    for label, pat in CHANNEL_PATTERNS:
-        if re.search(pat, base, flags=re.IGNORECASE):
+    for label, pat in CHANNEL_PATTERNS_COMPILED:
+        if pat.search(base):
             detected_channel = label
-            base = re.sub(pat, '', base, flags=re.IGNORECASE)
-    supplier_name = re.sub(r'\s{2,}', ' ', base).strip().title()
+            base = pat.sub('', base)
+    supplier_name = _WS_RE.sub(' ', base).strip().title()
     if not supplier_name:
         supplier_name = header_text
     return supplier_name, detected_channel
 
+# Bump when load_price_workbook's conversion rules change so old snapshots are not reused
+SNAPSHOT_VERSION = 1
+
+def load_price_workbook(path, sheet_name, columns):
+    # Only `columns` are materialized (others are skipped during the read). Parquet snapshot next to
+    # the workbook, keyed by mtime+size+column set+engine/version so a change to any of them invalidates it
+    wanted = set(columns)
+    cols_key = hashlib.blake2b("\0".join(sorted(wanted)).encode("utf-8"), digest_size=4).hexdigest()
+    key = f"{path}.{os.path.getmtime(path):.0f}.{os.path.getsize(path)}.{sheet_name}.{cols_key}.{EXCEL_ENGINE}-v{SNAPSHOT_VERSION}.parquet"
+    if os.path.exists(key):
+        log(f"Using cached snapshot {key}")
+        return pd.read_parquet(key)
+    df = pd.read_excel(path, sheet_name=sheet_name, engine=EXCEL_ENGINE, usecols=lambda c: str(c) in wanted)
+    df.columns = df.columns.astype(str)
+    # Parquet needs one type per column; mixed cells (e.g. 1.5 and "1,234.50") are kept as text
+    for col in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[col], skipna=True) in ("mixed", "mixed-integer"):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    # The snapshot is only an optimization; a read-only input folder must not stop the load
+    try:
+        for stale in glob.glob(f"{glob.escape(path)}.*.{glob.escape(sheet_name)}.*.parquet"):
+            os.remove(stale)
+        df.to_parquet(key, index=False)
+    except OSError as e:
+        log(f"Could not write snapshot {key} ({e}); continuing without cache")
+    return df
+
+def _blank_dictionary_to_null(chunk):
+    # Null out the indices that point at "" so the column stays dictionary-encoded
+    blank = pc.equal(chunk.dictionary, "")
+    if not pc.any(blank).as_py():
+        return chunk
+    indices = pc.if_else(pc.take(blank, chunk.indices), pa.scalar(None, chunk.indices.type), chunk.indices)
+    return pa.DictionaryArray.from_arrays(indices, chunk.dictionary)
+
+def blank_to_null(table):
+    # Arrow quotes every string, so "" would reach COPY as an empty string (and fail for DATE
+    # columns). to_csv wrote "" and NaN alike as an unquoted empty field, i.e. NULL; keep that
+    for i, field in enumerate(table.schema):
+        col = table.column(i)
+        if pa.types.is_dictionary(field.type) and pa.types.is_string(field.type.value_type):
+            col = pa.chunked_array([_blank_dictionary_to_null(c) for c in col.chunks], type=field.type)
+        elif pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            col = pc.if_else(pc.equal(col, ""), pa.scalar(None, field.type), col)
+        else:
+            continue
+        table = table.set_column(i, field.name, col)
+    return table
+
+def write_table_csv(table, path):
+    # Arrow's multithreaded C++ writer; much faster than DataFrame.to_csv on the large price_quotes table
+    pa_csv.write_csv(blank_to_null(table), path, write_options=pa_csv.WriteOptions(include_header=True))
+
+def write_csv(df, path):
+    write_table_csv(pa.Table.from_pandas(df, preserve_index=False), path)
+
+def export_price_quotes_parquet(quotes, out_dir):
+    # Same NULLs as price_quotes.csv / the COPY stream, so the Parquet file loads into DATE columns too
+    pq.write_table(blank_to_null(quotes), os.path.join(out_dir, "price_quotes.parquet"), compression="zstd")
+
+def copy_price_quotes_to_postgres(quotes, dsn, table_name, chunk_rows=100_000):
+    # Stream straight into COPY in CSV chunks, no round-trip through price_quotes.csv on disk
+    import psycopg
+    from psycopg import sql
+    table = blank_to_null(quotes)
+    # Explicit column list (lowercase, as in the README's pq_stage DDL) so a missing Pack Size
+    # column still lines up with the staging table
+    stmt = sql.SQL("COPY {} ({}) FROM STDIN (FORMAT csv)").format(
+        sql.Identifier(*table_name.split(".")),
+        sql.SQL(", ").join(sql.Identifier(c.lower()) for c in table.column_names))
+    opts = pa_csv.WriteOptions(include_header=False)
+    with psycopg.connect(dsn) as conn, conn.cursor() as cur:
+        with cur.copy(stmt) as copy:
+            for batch in table.to_batches(max_chunksize=chunk_rows):
+                buf = io.BytesIO()
+                pa_csv.write_csv(batch, buf, write_options=opts)
+                copy.write(buf.getvalue())
+
+def dump_json(obj):
+    # Serialized once to indented UTF-8 bytes, reused for the file and the log
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2).encode("utf-8")
+
+def input_fingerprints(paths):
+    return {p: {"mtime": os.path.getmtime(p), "size": os.path.getsize(p)} for p in paths}
+
+def signature_values(series):
+    # Numbers are hashed as float64 whether stored as numbers or as text (an int column [1,2,3]
+    # and a text column ["1","2","3"] are duplicates); anything else is hashed as normalized text
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series.astype("float64")
+    if series.dtype == object:
+        num = pd.to_numeric(series, errors="coerce")
+        if pd.api.types.is_numeric_dtype(num) and num.notna().sum() == series.notna().sum():
+            return num.astype("float64")
+    return series.astype(str).replace({"nan":"<NA>"}).str.strip()
+
+# Artifacts main() may write (products.csv / supplier_items.csv only when there is data for them)
+OUTPUT_FILES = ["products.csv", "suppliers.csv", "supplier_items.csv", "price_quotes.csv", "price_quotes.parquet",
+                "reference_columns.csv", "duplicates.csv"]
+
+def outputs_up_to_date(manifest_path, out_dir, fingerprints):
+    # Reuse the last run only if its manifest is readable, was built from the same inputs and
+    # every artifact it recorded is still on disk; anything else means regenerate
+    try:
+        with open(manifest_path, "r") as f:
+            previous = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return False
+    if not isinstance(previous, dict) or previous.get("input_fingerprints") != fingerprints:
+        return False
+    outputs = previous.get("outputs")
+    return bool(outputs) and all(os.path.exists(os.path.join(out_dir, f)) for f in outputs)
+
 def col_signature(series):
-    s = series.astype(str).replace({"nan":"<NA>"}).str.strip()
-    joined = "|".join(s.tolist())
-    return hashlib.md5(joined.encode("utf-8")).hexdigest()
+    # Hash the cells in C (hash_pandas_object) and digest the uint64 array, no joined string needed
+    hashed = hash_pandas_object(series, index=False).to_numpy()
+    return hashlib.blake2b(hashed.tobytes(), digest_size=8).hexdigest()
+
+def build_reference_columns(mapping_present, out_dir):
+    ref_cols = mapping_present.loc[mapping_present["FinalBucket"]=="Reference/Derived", ["Column","Notes"]].copy()
+    ref_cols.rename(columns={"Column":"column_name","Notes":"notes"}, inplace=True)
+    ref_cols["last_seen_on"] = datetime.utcnow().date().isoformat()
+    write_csv(ref_cols, os.path.join(out_dir, "reference_columns.csv"))
+    log(f"Reference/Derived columns: {len(ref_cols)}")
+    return ref_cols
+
+def export_suppliers(col_to_sup_chan, out_dir):
+    suppliers = sorted({v[0] for v in col_to_sup_chan.values() if v[0]})
+    suppliers_df = pd.DataFrame({"name": suppliers})
+    write_csv(suppliers_df, os.path.join(out_dir, "suppliers.csv"))
+    return suppliers_df
+
+def export_products(df, out_dir):
+    pip_col = "MediCare PIPCode" if "MediCare PIPCode" in df.columns else None
+    name_col = "Product Name" if "Product Name" in df.columns else None
+    size_col = "Pack Size" if "Pack Size" in df.columns else None
+    products = pd.DataFrame()
+    if pip_col and name_col:
+        # One row per PIP (first seen), hashing only the PIP column
+        products = df.loc[df[pip_col].notna(), [pip_col, name_col] + ([size_col] if size_col else [])].drop_duplicates(subset=[pip_col], keep="first")
+        products.rename(columns={pip_col:"medicare_pip", name_col:"name", size_col:"pack_size"}, inplace=True)
+        write_csv(products, os.path.join(out_dir, "products.csv"))
+    return products
+
+_PRICE_TEXT_RE = r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$"
+
+def parse_price_text(values):
+    # Arrow string kernels: drop thousands separators, trim, then cast; non-numbers become NaN (like errors="coerce")
+    arr = pa.array(values.astype(str).to_numpy(), type=pa.string())
+    cleaned = pc.utf8_trim_whitespace(pc.replace_substring(arr, ",", ""))
+    numeric = pc.if_else(pc.match_substring_regex(cleaned, _PRICE_TEXT_RE), cleaned, pa.scalar(None, pa.string()))
+    return pc.cast(numeric, pa.float64()).to_numpy(zero_copy_only=False)
+
+_NON_PRICE_TYPES = (bool, np.bool_, date, time, timedelta)
+
+def clean_prices(values):
+    # Numeric cells pass straight through; only the unparsed text cells get comma/space cleanup.
+    # Booleans and dates/times are not prices (to_numeric would turn them into 1.0 / epoch ns)
+    if (pd.api.types.is_bool_dtype(values) or pd.api.types.is_datetime64_any_dtype(values)
+            or pd.api.types.is_timedelta64_dtype(values)):
+        return pd.Series(np.nan, index=values.index, dtype="float64")
+    if values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) not in ("floating", "integer", "mixed-integer-float", "string", "empty"):
+        values = values.mask(values.map(lambda v: isinstance(v, _NON_PRICE_TYPES)))
+    num = pd.to_numeric(values, errors="coerce").astype("float64")
+    mask = num.isna() & values.notna()
+    if mask.any():
+        num.loc[mask] = parse_price_text(values.loc[mask])
+    # "inf"/"-inf" text is parsed by to_numeric; an infinite price is never a real quote
+    return num.where(np.isfinite(num))
+
+def _constant_column(value, n):
+    # One dictionary entry shared by all n rows (becomes a pandas categorical)
+    return pa.DictionaryArray.from_arrays(pa.array(np.zeros(n, dtype=np.int32)), pa.array([value], type=pa.string()))
+
+def _quote_rows(base, keep, prices, constants):
+    n = int(keep.sum())
+    table = base.filter(pa.array(keep))
+    for name, value in constants.items():
+        table = table.append_column(name, _constant_column(value, n))
+    return table.append_column("QuotedPrice", pa.array(prices[keep], type=pa.float64()))
+
+def build_price_quotes(df, supplier_cols, col_to_sup_chan):
+    # Staging rows as an Arrow table, built one supplier column at a time instead of melting all
+    # N·K cells: each column keeps only its numeric prices > 0, so peak memory stays O(N)
+    base_cols = [c for c in ["MediCare PIPCode","Product Name","Pack Size"] if c in df.columns]
+    if not (base_cols and supplier_cols):
+        return pa.table({})
+    run_date = datetime.utcnow()
+    quoted_on = run_date.date().isoformat()
+    batch_id = "initial_migration_" + run_date.strftime("%Y%m%dT%H%M%SZ")
+    rename_map = {"MediCare PIPCode":"MediCarePIPCode", "Product Name":"ProductName", "Pack Size":"PackSize"}
+
+    base = (pa.Table.from_pandas(df[base_cols], preserve_index=False)
+            .replace_schema_metadata(None)
+            .rename_columns([rename_map[c] for c in base_cols]))
+    tables = []
+    for col in supplier_cols:
+        prices = clean_prices(df[col]).to_numpy()
+        keep = prices > 0
+        if not keep.any():
+            continue
+        supplier, channel = col_to_sup_chan.get(col, ("", ""))
+        constants = {"Supplier": supplier, "Channel": channel, "SourceColumn": col, "ValidFrom": parse_valid_from(col),
+                     "QuotedOn": quoted_on, "BatchId": batch_id}
+        tables.append(_quote_rows(base, keep, prices, constants))
+    if not tables:
+        # No quotes at all: still emit the full column set (header-only CSV)
+        empty = {name: "" for name in ["Supplier","Channel","SourceColumn","ValidFrom","QuotedOn","BatchId"]}
+        return _quote_rows(base, np.zeros(base.num_rows, dtype=bool), np.zeros(base.num_rows), empty)
+    return pa.concat_tables(tables)
+
+def export_supplier_items(quotes, out_dir):
+    # Optional supplier_items scaffold (supplier x product combos seen); only these two columns go to pandas
+    supplier_items = pd.DataFrame()
+    if quotes.num_rows:
+        supplier_items = quotes.select(["Supplier","MediCarePIPCode"]).to_pandas().drop_duplicates()
+        supplier_items.rename(columns={"MediCarePIPCode":"medicare_pip"}, inplace=True)
+        write_csv(supplier_items, os.path.join(out_dir, "supplier_items.csv"))
+    return supplier_items
+
+def export_duplicates_report(df, supplier_cols, out_dir):
+    # Duplicate report (by identical data signatures per supplier column)
+    sigs = pd.Series([col_signature(signature_values(df[col])) for col in supplier_cols], index=supplier_cols, dtype=object)
+    # Keep only shared signatures, then group columns by signature in one pass
+    shared = sigs[sigs.duplicated(keep=False)]
+    dupes = [{"signature":sig, "columns":"; ".join(cols.index), "count":len(cols)} for sig, cols in shared.groupby(shared, sort=False)]
+    dupes_df = pd.DataFrame(dupes).sort_values("count", ascending=False) if dupes else pd.DataFrame(columns=["signature","columns","count"])
+    write_csv(dupes_df, os.path.join(out_dir, "duplicates.csv"))
+    return dupes_df
 
 def main():
     with open("config.yaml","r") as f:
@@ -113,29 +382,34 @@ def main():
     out_dir = cfg["outputs"]["dir"]
     os.makedirs(out_dir, exist_ok=True)
 
+    # Skip the run when inputs, config and loader are unchanged since the last manifest (--force to rerun)
+    fingerprints = input_fingerprints([src_excel, src_mapping, src_alias, "config.yaml", os.path.abspath(__file__)])
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    if "--force" not in sys.argv[1:] and outputs_up_to_date(manifest_path, out_dir, fingerprints):
+        log("Nothing changed; skipping.")
+        return
+
     log("Loading inputs…")
-    df = pd.read_excel(src_excel, sheet_name=src_sheet)
     mapping = pd.read_csv(src_mapping)
     if "Notes" not in mapping.columns: mapping["Notes"] = ""
     alias = pd.read_csv(src_alias)
 
     # Normalize mapping
-    mapping["FinalBucket"] = [normalize_bucket_with_notes(b, n) for b, n in zip(mapping.get("Bucket",""), mapping.get("Notes",""))]
-    mapping_present = mapping[mapping["Column"].isin(df.columns)].copy()
+    mapping["FinalBucket"] = normalize_buckets_with_notes(mapping["Bucket"], mapping["Notes"])
 
-    # Build reference column table
-    ref_cols = mapping_present.loc[mapping_present["FinalBucket"]=="Reference/Derived", ["Column","Notes"]].copy()
-    ref_cols.rename(columns={"Column":"column_name","Notes":"notes"}, inplace=True)
-    ref_cols["last_seen_on"] = datetime.utcnow().date().isoformat()
-    ref_out = os.path.join(out_dir, "reference_columns.csv")
-    ref_cols.to_csv(ref_out, index=False)
-    log(f"Reference/Derived columns: {len(ref_cols)}")
+    # Only product, supplier/price and reference columns are used downstream; skip the rest of the sheet
+    needed = set(mapping.loc[mapping["FinalBucket"].isin(["Supplier/Price","Reference/Derived"]), "Column"].astype(str))
+    needed |= {"MediCare PIPCode","Product Name","Pack Size"}
+    df = load_price_workbook(src_excel, src_sheet, needed)
+    mapping_present = mapping[mapping["Column"].isin(df.columns)].copy()
 
     # Identify supplier/price columns for staging
     supplier_cols = mapping_present.loc[mapping_present["FinalBucket"]=="Supplier/Price","Column"].tolist()
 
     # Build alias dicts
-    alias_cols = {row["SourceColumn"]: (row.get("ProposedSupplier",""), row.get("ProposedChannel","")) for _,row in alias.iterrows()}
+    alias_vals = alias.reindex(columns=["SourceColumn","ProposedSupplier","ProposedChannel"], fill_value="")
+    alias_cols = dict(zip(alias_vals["SourceColumn"].to_numpy(),
+                          zip(alias_vals["ProposedSupplier"].to_numpy(), alias_vals["ProposedChannel"].to_numpy())))
 
     # Create supplier + channel lookup per column
     col_to_sup_chan = {}
@@ -146,74 +420,40 @@ def main():
             sup, chan = parse_supplier_and_channel_from_header(col)
         col_to_sup_chan[col] = (str(sup).strip().title(), str(chan).strip())
 
-    # Suppliers list
-    suppliers = sorted({v[0] for v in col_to_sup_chan.values() if v[0]})
-    suppliers_df = pd.DataFrame({"name": suppliers})
-    suppliers_out = os.path.join(out_dir, "suppliers.csv")
-    suppliers_df.to_csv(suppliers_out, index=False)
+    # The artifacts are independent given df/mapping/lookup; the writers and hashing release the GIL
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as ex:
+        ref_f = ex.submit(build_reference_columns, mapping_present, out_dir)
+        suppliers_f = ex.submit(export_suppliers, col_to_sup_chan, out_dir)
+        products_f = ex.submit(export_products, df, out_dir)
+        dupes_f = ex.submit(export_duplicates_report, df, supplier_cols, out_dir)
 
-    # Products (from sheet)
-    pip_col = "MediCare PIPCode" if "MediCare PIPCode" in df.columns else None
-    name_col = "Product Name" if "Product Name" in df.columns else None
-    size_col = "Pack Size" if "Pack Size" in df.columns else None
-    products = pd.DataFrame()
-    if pip_col and name_col:
-        products = df[[pip_col, name_col] + ([size_col] if size_col else [])].dropna(subset=[pip_col]).drop_duplicates()
-        products.rename(columns={pip_col:"medicare_pip", name_col:"name", size_col:"pack_size" if size_col else "":""}, inplace=True)
-        products_out = os.path.join(out_dir, "products.csv")
-        products.to_csv(products_out, index=False)
+        quotes = build_price_quotes(df, supplier_cols, col_to_sup_chan)
+        pq_fs = [ex.submit(write_table_csv, quotes, os.path.join(out_dir, "price_quotes.csv")),
+                 ex.submit(export_price_quotes_parquet, quotes, out_dir)]
+        supplier_items_f = ex.submit(export_supplier_items, quotes, out_dir)
 
-    # Melt to staging
-    base_cols = [c for c in ["MediCare PIPCode","Product Name","Pack Size"] if c in df.columns]
-    melted = pd.DataFrame()
-    if base_cols and supplier_cols:
-        melted = df[base_cols + supplier_cols].melt(id_vars=base_cols, var_name="SourceColumn", value_name="QuotedPrice")
-        # Numeric > 0 only
-        melted["QuotedPrice"] = pd.to_numeric(melted["QuotedPrice"].astype(str).str.replace(",","").str.strip(), errors="coerce")
-        melted = melted[melted["QuotedPrice"].notna() & (melted["QuotedPrice"] > 0)]
-
-        # Enrich with supplier/channel and dates
-        melted["Supplier"] = melted["SourceColumn"].map(lambda c: col_to_sup_chan.get(c, ("", ""))[0])
-        melted["Channel"]  = melted["SourceColumn"].map(lambda c: col_to_sup_chan.get(c, ("", ""))[1])
-        melted["ValidFrom"] = melted["SourceColumn"].map(parse_valid_from)
-        melted["QuotedOn"]  = datetime.utcnow().date().isoformat()
-        melted["BatchId"]   = "initial_migration_" + datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-
-        # Reorder & rename
-        rename_map = {"MediCare PIPCode":"MediCarePIPCode", "Product Name":"ProductName", "Pack Size":"PackSize"}
-        keep = [c for c in ["MediCare PIPCode","Product Name","Pack Size"] if c in melted.columns]
-        melted = melted[keep + ["Supplier","Channel","SourceColumn","ValidFrom","QuotedOn","BatchId","QuotedPrice"]].rename(columns=rename_map)
-
-    # Export price_quotes.csv (staging)
-    pq_out = os.path.join(out_dir, "price_quotes.csv")
-    melted.to_csv(pq_out, index=False)
-
-    # Optional supplier_items scaffold (supplier x product combos seen)
-    supplier_items = pd.DataFrame()
-    if not melted.empty:
-        supplier_items = melted[["Supplier","MediCarePIPCode"]].drop_duplicates().copy()
-        supplier_items.rename(columns={"MediCarePIPCode":"medicare_pip"}, inplace=True)
-        supplier_items_out = os.path.join(out_dir, "supplier_items.csv")
-        supplier_items.to_csv(supplier_items_out, index=False)
+        pg_dsn = cfg["outputs"].get("pg_dsn")
+        if pg_dsn and quotes.num_rows:
+            pg_table = cfg["outputs"].get("pg_table", "pq_stage")
+            log(f"Copying {quotes.num_rows} price quotes into {pg_table}…")
+            copy_price_quotes_to_postgres(quotes, pg_dsn, pg_table)
 
-    # Duplicate report (by identical data signatures per supplier column)
-    dupe_groups = {}
-    for col in supplier_cols:
-        sig = hashlib.md5("|".join(df[col].astype(str).replace({"nan":"<NA>"}).str.strip().tolist()).encode("utf-8")).hexdigest()
-        dupe_groups.setdefault(sig, []).append(col)
-    dupes = [{"signature":sig, "columns":"; ".join(cols), "count":len(cols)} for sig, cols in dupe_groups.items() if len(cols) > 1]
-    dupes_df = pd.DataFrame(dupes).sort_values("count", ascending=False) if dupes else pd.DataFrame(columns=["signature","columns","count"])
-    dupes_out = os.path.join(out_dir, "duplicates.csv")
-    dupes_df.to_csv(dupes_out, index=False)
+        ref_cols = ref_f.result()
+        suppliers_df = suppliers_f.result()
+        products = products_f.result()
+        dupes_df = dupes_f.result()
+        supplier_items = supplier_items_f.result()
+        for f in pq_fs:
+            f.result()
 
     # Manifest
     manifest = {
-        "batch_id": melted["BatchId"].iloc[0] if not melted.empty else None,
+        "batch_id": quotes.column("BatchId")[0].as_py() if quotes.num_rows else None,
         "rows": {
             "products": len(products) if not products.empty else 0,
             "suppliers": len(suppliers_df),
             "supplier_items": len(supplier_items) if not supplier_items.empty else 0,
-            "price_quotes": len(melted),
+            "price_quotes": quotes.num_rows,
             "reference_columns": len(ref_cols),
             "duplicates": len(dupes_df)
         },
@@ -223,13 +463,16 @@ def main():
             "mapping": src_mapping,
             "alias": src_alias
         },
+        "input_fingerprints": fingerprints,
+        "outputs": sorted(f for f in OUTPUT_FILES if os.path.exists(os.path.join(out_dir, f))),
         "created_at_utc": datetime.utcnow().isoformat()+"Z"
     }
-    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
-        json.dump(manifest, f, indent=2)
+    manifest_json = dump_json(manifest)
+    with open(manifest_path, "wb") as f:
+        f.write(manifest_json)
 
     log("Done.")
-    log(json.dumps(manifest, indent=2))
+    log(manifest_json.decode("utf-8"))
 
 if __name__ == "__main__":
     main()